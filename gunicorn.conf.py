@@ -0,0 +1,6 @@
+import multiprocessing
+
+bind = "0.0.0.0:5000"
+wsgi_app = "main:asgi_app"
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = 2 * multiprocessing.cpu_count()
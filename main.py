@@ -1,11 +1,28 @@
 import asyncio
-import json
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 
-from flask import Flask, flash, redirect, render_template, request, session, url_for
+import bcrypt
+import click
+import orjson
+from a2wsgi import WSGIMiddleware
+from cachetools import TTLCache
+from flask import (
+    Flask,
+    flash,
+    g,
+    get_flashed_messages,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_template,
+    url_for,
+)
 from libsql_client import create_client
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.security import check_password_hash
 
 DATABASE_URL = os.environ.get("TURSO_DATABASE_URL")
 DATABASE_AUTH_TOKEN = os.environ.get("TURSO_AUTH_TOKEN")
@@ -16,100 +33,211 @@ if not DATABASE_URL:
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret")
 
+# Set to 0 when the schema is managed with `flask --app main init-db` instead.
+AUTO_INIT_DB = os.environ.get("AUTO_INIT_DB", "1") != "0"
+
+# Tune so a single verify takes roughly 100ms on the deployment host.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+
+json_loads = orjson.loads
+
+
+def json_dumps(value):
+    return orjson.dumps(value).decode()
+
+
+POOL_MIN_SIZE = 5
+POOL_MAX_SIZE = 20
+POOL_MAX_QUERIES = 50000
+
+
+class ClientPool:
+    """Bounded pool of libsql clients living on the background DB loop."""
+
+    def __init__(self, min_size, max_size, max_queries):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_queries = max_queries
+        self._idle = None
+        self._uses = {}
+
+    def _connect(self):
+        client = create_client(DATABASE_URL, auth_token=DATABASE_AUTH_TOKEN)
+        self._uses[client] = 0
+        return client
+
+    async def _discard(self, client):
+        self._uses.pop(client, None)
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+    def health_check(self, client):
+        return not client.closed and self._uses.get(client, 0) < self.max_queries
+
+    async def acquire(self):
+        if self._idle is None:
+            self._idle = asyncio.LifoQueue()
+            for _ in range(self.min_size):
+                self._idle.put_nowait(self._connect())
+        if self._idle.empty() and len(self._uses) < self.max_size:
+            client = self._connect()
+        else:
+            client = await self._idle.get()
+        if not self.health_check(client):
+            await self._discard(client)
+            client = self._connect()
+        return client
+
+    async def release(self, client):
+        self._uses[client] += 1
+        self._idle.put_nowait(client)
+
+
+DB_LOOP = asyncio.new_event_loop()
+threading.Thread(target=DB_LOOP.run_forever, name="db-loop", daemon=True).start()
+pool = ClientPool(POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_MAX_QUERIES)
+
+
+def _run(coro):
+    return asyncio.run_coroutine_threadsafe(coro, DB_LOOP).result()
+
 
 async def _execute(query, args=None):
-    async with create_client(DATABASE_URL, auth_token=DATABASE_AUTH_TOKEN) as client:
+    client = await pool.acquire()
+    try:
         return await client.execute(query, args or ())
+    finally:
+        await pool.release(client)
+
+
+async def _batch(statements):
+    client = await pool.acquire()
+    try:
+        return await client.batch(statements)
+    finally:
+        await pool.release(client)
 
 
 def db_execute(query, args=None):
-    return asyncio.run(_execute(query, args))
+    return _run(_execute(query, args))
 
 
-def db_fetchall(query, args=None):
-    result = asyncio.run(_execute(query, args))
+def db_batch(statements):
+    """Run ``(query, args)`` pairs in one round trip, inside a transaction."""
+    return _run(_batch(statements))
+
+
+def _rows(result):
     return [dict(zip(result.columns, row)) for row in result.rows]
 
 
+def db_fetchall(query, args=None):
+    return _rows(_run(_execute(query, args)))
+
+
 def db_fetchone(query, args=None):
     rows = db_fetchall(query, args)
     return rows[0] if rows else None
 
 
+def _password_bytes(password):
+    # bcrypt only looks at the first 72 bytes; newer releases raise instead of truncating.
+    return password.encode("utf-8")[:72]
+
+
+def hash_password(password):
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+
+def is_legacy_hash(password_hash):
+    return not password_hash.startswith("$2")
+
+
+def verify_password(password_hash, password):
+    if is_legacy_hash(password_hash):
+        # Accounts created before the switch still carry werkzeug PBKDF2 hashes.
+        return check_password_hash(password_hash, password)
+    return bcrypt.checkpw(_password_bytes(password), password_hash.encode())
+
+
+# Verified against when the email is unknown so both login paths cost one hash check.
+DUMMY_PASSWORD_HASH = hash_password(os.urandom(16).hex())
+
+
 def init_db():
-    db_execute(
-        """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            is_admin INTEGER NOT NULL DEFAULT 0,
-            created_at TEXT NOT NULL
-        )
-        """
-    )
-    db_execute(
-        """
-        CREATE TABLE IF NOT EXISTS subjects (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL
-        )
-        """
-    )
-    db_execute(
-        """
-        CREATE TABLE IF NOT EXISTS mcqs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            subject_id INTEGER NOT NULL,
-            question TEXT NOT NULL,
-            options_json TEXT NOT NULL,
-            correct_index INTEGER NOT NULL,
-            created_at TEXT NOT NULL,
-            FOREIGN KEY(subject_id) REFERENCES subjects(id)
-        )
-        """
-    )
-    db_execute(
-        """
-        CREATE TABLE IF NOT EXISTS attempts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            mcq_id INTEGER NOT NULL,
-            selected_index INTEGER NOT NULL,
-            is_correct INTEGER NOT NULL,
-            attempted_at TEXT NOT NULL,
-            FOREIGN KEY(user_id) REFERENCES users(id),
-            FOREIGN KEY(mcq_id) REFERENCES mcqs(id)
-        )
-        """
-    )
-    db_execute(
-        """
-        CREATE TABLE IF NOT EXISTS exams (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            mode TEXT NOT NULL,
-            subject_ids_json TEXT NOT NULL,
-            question_count INTEGER NOT NULL,
-            time_limit_minutes INTEGER NOT NULL,
-            start_time TEXT NOT NULL,
-            submitted_at TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-        """
-    )
-    db_execute(
-        """
-        CREATE TABLE IF NOT EXISTS exam_questions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            exam_id INTEGER NOT NULL,
-            mcq_id INTEGER NOT NULL,
-            selected_index INTEGER,
-            is_correct INTEGER,
-            FOREIGN KEY(exam_id) REFERENCES exams(id),
-            FOREIGN KEY(mcq_id) REFERENCES mcqs(id)
-        )
-        """
+    db_batch(
+        [
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                is_admin INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS subjects (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS mcqs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subject_id INTEGER NOT NULL,
+                question TEXT NOT NULL,
+                options_json TEXT NOT NULL,
+                correct_index INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                FOREIGN KEY(subject_id) REFERENCES subjects(id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                mcq_id INTEGER NOT NULL,
+                selected_index INTEGER NOT NULL,
+                is_correct INTEGER NOT NULL,
+                attempted_at TEXT NOT NULL,
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(mcq_id) REFERENCES mcqs(id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS exams (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                mode TEXT NOT NULL,
+                subject_ids_json TEXT NOT NULL,
+                question_count INTEGER NOT NULL,
+                time_limit_minutes INTEGER NOT NULL,
+                start_time TEXT NOT NULL,
+                submitted_at TEXT,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS exam_questions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                exam_id INTEGER NOT NULL,
+                mcq_id INTEGER NOT NULL,
+                selected_index INTEGER,
+                is_correct INTEGER,
+                FOREIGN KEY(exam_id) REFERENCES exams(id),
+                FOREIGN KEY(mcq_id) REFERENCES mcqs(id)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_attempts_user_correct ON attempts(user_id, is_correct)",
+            "CREATE INDEX IF NOT EXISTS idx_attempts_user_date ON attempts(user_id, attempted_at)",
+            "CREATE INDEX IF NOT EXISTS idx_attempts_mcq_user ON attempts(mcq_id, user_id)",
+            "CREATE INDEX IF NOT EXISTS idx_mcqs_subject ON mcqs(subject_id)",
+            "CREATE INDEX IF NOT EXISTS idx_exam_questions_exam ON exam_questions(exam_id)",
+        ]
     )
 
 
@@ -123,15 +251,75 @@ def ensure_admin_seed():
         return
     db_execute(
         "INSERT INTO users (email, password_hash, is_admin, created_at) VALUES (?, ?, 1, ?)",
-        (admin_email, generate_password_hash(admin_password), datetime.utcnow().isoformat()),
+        (admin_email, hash_password(admin_password), datetime.utcnow().isoformat()),
     )
 
 
+SUBJECTS_CACHE_TTL = 60
+_subjects_cache = {"data": None, "version": 0, "loaded_at": 0.0}
+_subjects_version = 0
+
+
+def invalidate_subjects():
+    global _subjects_version
+    _subjects_version += 1
+
+
+def get_subjects_cached():
+    # Writes in other worker processes only show up once the TTL lapses.
+    cache = _subjects_cache
+    version = _subjects_version
+    now = time.monotonic()
+    if (
+        cache["data"] is None
+        or cache["version"] != version
+        or now - cache["loaded_at"] > SUBJECTS_CACHE_TTL
+    ):
+        cache["data"] = db_fetchall("SELECT id, name FROM subjects ORDER BY name")
+        cache["version"] = version
+        cache["loaded_at"] = now
+    return cache["data"]
+
+
+# Days before today never change, so only today's trend row is queried on every view.
+TREND_CACHE_TTL = 3600
+_trend_cache = TTLCache(maxsize=10_000, ttl=TREND_CACHE_TTL)
+_trend_cache_lock = threading.Lock()
+
+
+def get_trend_history_cached(user_id, today):
+    with _trend_cache_lock:
+        entry = _trend_cache.get(user_id)
+    if entry and entry[0] == today:
+        return entry[1]
+    return None
+
+
+def cache_trend_history(user_id, today, rows):
+    with _trend_cache_lock:
+        _trend_cache[user_id] = (today, rows)
+
+
+def invalidate_trend_history(user_id):
+    with _trend_cache_lock:
+        _trend_cache.pop(user_id, None)
+
+
 def current_user():
+    if "user" in g:
+        return g.user
     user_id = session.get("user_id")
     if not user_id:
-        return None
-    return db_fetchone("SELECT id, email, is_admin FROM users WHERE id = ?", (user_id,))
+        g.user = None
+    else:
+        g.user = db_fetchone("SELECT id, email, is_admin FROM users WHERE id = ?", (user_id,))
+    return g.user
+
+
+@app.before_request
+def reset_current_user():
+    g.pop("user", None)
+
 
 @app.context_processor
 def inject_current_user():
@@ -181,7 +369,7 @@ def signup():
             return render_template("signup.html")
         db_execute(
             "INSERT INTO users (email, password_hash, is_admin, created_at) VALUES (?, ?, 0, ?)",
-            (email, generate_password_hash(password), datetime.utcnow().isoformat()),
+            (email, hash_password(password), datetime.utcnow().isoformat()),
         )
         flash("Account created. Please log in.")
         return redirect(url_for("login"))
@@ -194,9 +382,15 @@ def login():
         email = request.form.get("email", "").strip().lower()
         password = request.form.get("password", "")
         user = db_fetchone("SELECT id, password_hash FROM users WHERE email = ?", (email,))
-        if not user or not check_password_hash(user["password_hash"], password):
+        password_hash = user["password_hash"] if user else DUMMY_PASSWORD_HASH
+        if not verify_password(password_hash, password) or not user:
             flash("Invalid credentials.")
             return render_template("login.html")
+        if is_legacy_hash(user["password_hash"]):
+            db_execute(
+                "UPDATE users SET password_hash = ? WHERE id = ?",
+                (hash_password(password), user["id"]),
+            )
         session["user_id"] = user["id"]
         return redirect(url_for("dashboard"))
     return render_template("login.html")
@@ -212,42 +406,65 @@ def logout():
 @login_required
 def dashboard():
     user = current_user()
-    subjects = db_fetchall(
+    today = datetime.utcnow().date().isoformat()
+    history = get_trend_history_cached(user["id"], today)
+    statements = [
         """
         SELECT subjects.id, subjects.name, COUNT(mcqs.id) AS mcq_count
         FROM subjects
         LEFT JOIN mcqs ON mcqs.subject_id = subjects.id
         GROUP BY subjects.id
         ORDER BY subjects.name
-        """
-    )
-    total_mcqs = sum(item["mcq_count"] for item in subjects)
-    attempts = db_fetchone(
-        """
-        SELECT COUNT(*) AS total_attempts,
-               SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) AS correct_attempts
-        FROM attempts
-        WHERE user_id = ?
         """,
-        (user["id"],),
-    )
-    attempts = attempts or {"total_attempts": 0, "correct_attempts": 0}
+        (
+            """
+            SELECT COUNT(*) AS total_attempts,
+                   SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) AS correct_attempts
+            FROM attempts
+            WHERE user_id = ?
+            """,
+            (user["id"],),
+        ),
+        (
+            """
+            SELECT DATE(attempted_at) AS attempt_date,
+                   COUNT(*) AS total,
+                   SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) AS correct
+            FROM attempts
+            WHERE user_id = ? AND attempted_at >= ?
+            GROUP BY DATE(attempted_at)
+            """,
+            (user["id"], today),
+        ),
+    ]
+    if history is None:
+        statements.append(
+            (
+                """
+                SELECT DATE(attempted_at) AS attempt_date,
+                       COUNT(*) AS total,
+                       SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) AS correct
+                FROM attempts
+                WHERE user_id = ? AND attempted_at < ?
+                GROUP BY DATE(attempted_at)
+                ORDER BY attempt_date DESC
+                LIMIT 7
+                """,
+                (user["id"], today),
+            )
+        )
+    results = db_batch(statements)
+    subjects = _rows(results[0])
+    total_mcqs = sum(item["mcq_count"] for item in subjects)
+    attempts = _rows(results[1])
+    attempts = attempts[0] if attempts else {"total_attempts": 0, "correct_attempts": 0}
     accuracy = 0
     if attempts["total_attempts"]:
         accuracy = round((attempts["correct_attempts"] / attempts["total_attempts"]) * 100, 2)
-    trend_rows = db_fetchall(
-        """
-        SELECT DATE(attempted_at) AS attempt_date,
-               COUNT(*) AS total,
-               SUM(CASE WHEN is_correct = 1 THEN 1 ELSE 0 END) AS correct
-        FROM attempts
-        WHERE user_id = ?
-        GROUP BY DATE(attempted_at)
-        ORDER BY attempt_date DESC
-        LIMIT 7
-        """,
-        (user["id"],),
-    )
+    if history is None:
+        history = _rows(results[3])
+        cache_trend_history(user["id"], today, history)
+    trend_rows = (_rows(results[2]) + history)[:7]
     trends = [
         {
             "date": row["attempt_date"],
@@ -282,11 +499,12 @@ def admin_subjects():
         else:
             try:
                 db_execute("INSERT INTO subjects (name) VALUES (?)", (name,))
+                invalidate_subjects()
                 flash("Subject added.")
             except Exception:
                 flash("Subject already exists.")
         return redirect(url_for("admin_subjects"))
-    subjects = db_fetchall("SELECT id, name FROM subjects ORDER BY name")
+    subjects = get_subjects_cached()
     return render_template("admin_subjects.html", subjects=subjects)
 
 
@@ -303,6 +521,7 @@ def edit_subject(subject_id):
             flash("Subject name is required.")
         else:
             db_execute("UPDATE subjects SET name = ? WHERE id = ?", (name, subject_id))
+            invalidate_subjects()
             flash("Subject renamed.")
             return redirect(url_for("admin_subjects"))
     return render_template("edit_subject.html", subject=subject)
@@ -311,8 +530,13 @@ def edit_subject(subject_id):
 @app.route("/admin/subjects/<int:subject_id>/delete", methods=["POST"])
 @admin_required
 def delete_subject(subject_id):
-    db_execute("DELETE FROM mcqs WHERE subject_id = ?", (subject_id,))
-    db_execute("DELETE FROM subjects WHERE id = ?", (subject_id,))
+    db_batch(
+        [
+            ("DELETE FROM mcqs WHERE subject_id = ?", (subject_id,)),
+            ("DELETE FROM subjects WHERE id = ?", (subject_id,)),
+        ]
+    )
+    invalidate_subjects()
     flash("Subject deleted.")
     return redirect(url_for("admin_subjects"))
 
@@ -322,40 +546,57 @@ def delete_subject(subject_id):
 def admin_mcqs():
     subject_id = request.args.get("subject_id", "all")
     page = max(int(request.args.get("page", 1)), 1)
-    offset = (page - 1) * 100
-    subjects = db_fetchall("SELECT id, name FROM subjects ORDER BY name")
+    after = request.args.get("after", type=int)
+    before = request.args.get("before", type=int)
+    subjects = get_subjects_cached()
     params = []
-    where_clause = ""
+    conditions = []
     if subject_id != "all":
-        where_clause = "WHERE subjects.id = ?"
+        conditions.append("subjects.id = ?")
         params.append(int(subject_id))
-    mcqs = db_fetchall(
+    order = "ASC"
+    if before is not None:
+        conditions.append("mcqs.id < ?")
+        params.append(before)
+        order = "DESC"
+    elif after is not None:
+        conditions.append("mcqs.id > ?")
+        params.append(after)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = db_fetchall(
         f"""
         SELECT mcqs.id, mcqs.question, mcqs.options_json, mcqs.correct_index,
                subjects.name AS subject_name
         FROM mcqs
         JOIN subjects ON subjects.id = mcqs.subject_id
         {where_clause}
-        ORDER BY mcqs.id
-        LIMIT 100 OFFSET {offset}
+        ORDER BY mcqs.id {order}
+        LIMIT 100
         """,
         tuple(params),
     )
-    for mcq in mcqs:
-        mcq["options"] = json.loads(mcq["options_json"])
-    return render_template(
+    if before is not None:
+        rows.reverse()
+    # Options are decoded one row at a time while the page streams out.
+    mcqs = ({**row, "options": json_loads(row["options_json"])} for row in rows)
+    # Pop flashes before the session is saved; base.html reuses the cached list.
+    get_flashed_messages()
+    return stream_template(
         "admin_mcqs.html",
         mcqs=mcqs,
         subjects=subjects,
         selected_subject=subject_id,
         page=page,
+        first_id=rows[0]["id"] if rows else None,
+        last_id=rows[-1]["id"] if rows else None,
+        has_next=len(rows) == 100,
     )
 
 
 @app.route("/admin/mcqs/add", methods=["GET", "POST"])
 @admin_required
 def add_mcq():
-    subjects = db_fetchall("SELECT id, name FROM subjects ORDER BY name")
+    subjects = get_subjects_cached()
     if request.method == "POST":
         subject_id = int(request.form.get("subject_id"))
         question = request.form.get("question", "").strip()
@@ -379,7 +620,7 @@ def add_mcq():
             (
                 subject_id,
                 question,
-                json.dumps(options),
+                json_dumps(options),
                 correct_index,
                 datetime.utcnow().isoformat(),
             ),
@@ -392,18 +633,24 @@ def add_mcq():
 @app.route("/admin/mcqs/upload", methods=["GET", "POST"])
 @admin_required
 def upload_mcqs():
-    subjects = db_fetchall("SELECT id, name FROM subjects ORDER BY name")
+    subjects = get_subjects_cached()
     if request.method == "POST":
         payload = request.form.get("mcq_json", "")
         try:
-            data = json.loads(payload)
-        except json.JSONDecodeError:
+            data = json_loads(payload)
+        except orjson.JSONDecodeError:
             flash("Invalid JSON.")
             return render_template("upload_mcqs.html", subjects=subjects)
         if not isinstance(data, list):
             flash("JSON should be a list of MCQs.")
             return render_template("upload_mcqs.html", subjects=subjects)
-        created = 0
+        now_iso = datetime.utcnow().isoformat()
+        # Read fresh: cached subjects may be stale when another worker has written.
+        subject_ids = {
+            subject["name"]: subject["id"]
+            for subject in db_fetchall("SELECT id, name FROM subjects")
+        }
+        statements = []
         for item in data:
             subject_name = item.get("subject")
             question = item.get("question")
@@ -411,28 +658,41 @@ def upload_mcqs():
             correct_index = item.get("correct_index")
             if not (subject_name and question and options and correct_index is not None):
                 continue
-            subject = db_fetchone("SELECT id FROM subjects WHERE name = ?", (subject_name,))
-            if not subject:
-                db_execute("INSERT INTO subjects (name) VALUES (?)", (subject_name,))
-                subject = db_fetchone("SELECT id FROM subjects WHERE name = ?", (subject_name,))
+            if subject_name not in subject_ids:
+                subject = db_fetchone(
+                    """
+                    INSERT INTO subjects (name) VALUES (?)
+                    ON CONFLICT(name) DO NOTHING
+                    RETURNING id
+                    """,
+                    (subject_name,),
+                )
+                if not subject:
+                    subject = db_fetchone("SELECT id FROM subjects WHERE name = ?", (subject_name,))
+                subject_ids[subject_name] = subject["id"]
+                invalidate_subjects()
             if not isinstance(options, list) or len(options) < 2:
                 continue
             if correct_index < 0 or correct_index >= len(options):
                 continue
-            db_execute(
-                """
-                INSERT INTO mcqs (subject_id, question, options_json, correct_index, created_at)
-                VALUES (?, ?, ?, ?, ?)
-                """,
+            statements.append(
                 (
-                    subject["id"],
-                    question,
-                    json.dumps(options),
-                    correct_index,
-                    datetime.utcnow().isoformat(),
-                ),
+                    """
+                    INSERT INTO mcqs (subject_id, question, options_json, correct_index, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (
+                        subject_ids[subject_name],
+                        question,
+                        json_dumps(options),
+                        correct_index,
+                        now_iso,
+                    ),
+                )
             )
-            created += 1
+        if statements:
+            db_batch(statements)
+        created = len(statements)
         flash(f"Uploaded {created} MCQs.")
         return redirect(url_for("admin_mcqs"))
     return render_template("upload_mcqs.html", subjects=subjects)
@@ -452,7 +712,7 @@ def edit_mcq(mcq_id):
     if not mcq:
         flash("MCQ not found.")
         return redirect(url_for("admin_mcqs"))
-    subjects = db_fetchall("SELECT id, name FROM subjects ORDER BY name")
+    subjects = get_subjects_cached()
     if request.method == "POST":
         subject_id = int(request.form.get("subject_id"))
         question = request.form.get("question", "").strip()
@@ -474,11 +734,11 @@ def edit_mcq(mcq_id):
             SET subject_id = ?, question = ?, options_json = ?, correct_index = ?
             WHERE id = ?
             """,
-            (subject_id, question, json.dumps(options), correct_index, mcq_id),
+            (subject_id, question, json_dumps(options), correct_index, mcq_id),
         )
         flash("MCQ updated.")
         return redirect(url_for("admin_mcqs"))
-    mcq["options"] = json.loads(mcq["options_json"])
+    mcq["options"] = json_loads(mcq["options_json"])
     return render_template("edit_mcq.html", mcq=mcq, subjects=subjects)
 
 
@@ -493,7 +753,7 @@ def delete_mcq(mcq_id):
 @app.route("/exam/setup", methods=["GET", "POST"])
 @login_required
 def exam_setup():
-    subjects = db_fetchall("SELECT id, name FROM subjects ORDER BY name")
+    subjects = get_subjects_cached()
     if request.method == "POST":
         subject_mode = request.form.get("subject_mode")
         mode = request.form.get("mode", "random")
@@ -501,7 +761,7 @@ def exam_setup():
             mode = "random"
         subject_ids = []
         if subject_mode == "all":
-            subject_ids = [str(subject["id"]) for subject in subjects]
+            subject_ids = [subject["id"] for subject in subjects]
         elif subject_mode == "single":
             subject_id = request.form.get("single_subject")
             if subject_id:
@@ -512,6 +772,7 @@ def exam_setup():
             flash("Select at least one subject.")
             return render_template("exam_setup.html", subjects=subjects)
         try:
+            subject_ids = [int(subject_id) for subject_id in subject_ids]
             question_count = int(request.form.get("question_count", 0))
             time_limit = int(request.form.get("time_limit", 0))
         except ValueError:
@@ -528,86 +789,71 @@ def exam_setup():
         if not selected_mcqs:
             flash("No MCQs available for the selected criteria.")
             return render_template("exam_setup.html", subjects=subjects)
-        result = db_execute(
-            """
-            INSERT INTO exams (user_id, mode, subject_ids_json, question_count, time_limit_minutes, start_time)
-            VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            (
-                user["id"],
-                mode,
-                json.dumps(subject_ids),
-                question_count,
-                time_limit,
-                datetime.utcnow().isoformat(),
-            ),
+        exam_result, _ = db_batch(
+            [
+                (
+                    """
+                    INSERT INTO exams (user_id, mode, subject_ids_json, question_count, time_limit_minutes, start_time)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        user["id"],
+                        mode,
+                        json_dumps(subject_ids),
+                        question_count,
+                        time_limit,
+                        datetime.utcnow().isoformat(),
+                    ),
+                ),
+                # Same transaction, so last_insert_rowid() is the exam just created.
+                (
+                    """
+                    INSERT INTO exam_questions (exam_id, mcq_id)
+                    SELECT last_insert_rowid(), value FROM json_each(?) ORDER BY key
+                    """,
+                    (json_dumps(selected_mcqs),),
+                ),
+            ]
         )
-        exam_id = result.last_insert_rowid
-        for mcq_id in selected_mcqs:
-            db_execute(
-                "INSERT INTO exam_questions (exam_id, mcq_id) VALUES (?, ?)",
-                (exam_id, mcq_id),
-            )
+        exam_id = exam_result.last_insert_rowid
         return redirect(url_for("take_exam", exam_id=exam_id))
     return render_template("exam_setup.html", subjects=subjects)
 
 
 def select_mcqs_for_exam(user_id, subject_ids, count, mode):
-    placeholders = ",".join(["?"] * len(subject_ids))
+    # One bound JSON array keeps the SQL text identical whatever the number of subjects.
+    subject_ids_json = json_dumps(subject_ids)
     if mode == "progress":
-        unattempted = db_fetchall(
-            f"""
+        # Unattempted first, then most often answered wrong, the rest at random.
+        rows = db_fetchall(
+            """
+            WITH user_attempts AS (
+                SELECT mcq_id,
+                       SUM(CASE WHEN is_correct = 0 THEN 1 ELSE 0 END) AS wrong_count
+                FROM attempts
+                WHERE user_id = ?
+                GROUP BY mcq_id
+            )
             SELECT mcqs.id
             FROM mcqs
-            WHERE mcqs.subject_id IN ({placeholders})
-              AND mcqs.id NOT IN (SELECT mcq_id FROM attempts WHERE user_id = ?)
-            """,
-            tuple(subject_ids) + (user_id,),
-        )
-        incorrect = db_fetchall(
-            f"""
-            SELECT mcqs.id, COUNT(*) AS wrong_count
-            FROM attempts
-            JOIN mcqs ON mcqs.id = attempts.mcq_id
-            WHERE attempts.user_id = ?
-              AND attempts.is_correct = 0
-              AND mcqs.subject_id IN ({placeholders})
-            GROUP BY mcqs.id
-            ORDER BY wrong_count DESC
+            LEFT JOIN user_attempts ON user_attempts.mcq_id = mcqs.id
+            WHERE mcqs.subject_id IN (SELECT value FROM json_each(?))
+            ORDER BY user_attempts.mcq_id IS NULL DESC,
+                     user_attempts.wrong_count DESC,
+                     RANDOM()
+            LIMIT ?
             """,
-            (user_id, *subject_ids),
+            (user_id, subject_ids_json, count),
         )
-        combined = [row["id"] for row in unattempted] + [row["id"] for row in incorrect]
-        unique = []
-        seen = set()
-        for mcq_id in combined:
-            if mcq_id not in seen:
-                unique.append(mcq_id)
-                seen.add(mcq_id)
-        if len(unique) < count:
-            remaining = db_fetchall(
-                f"""
-                SELECT id FROM mcqs
-                WHERE subject_id IN ({placeholders})
-                ORDER BY RANDOM()
-                """,
-                tuple(subject_ids),
-            )
-            for row in remaining:
-                if row["id"] not in seen:
-                    unique.append(row["id"])
-                    seen.add(row["id"])
-                if len(unique) >= count:
-                    break
-        return unique[:count]
+        return [row["id"] for row in rows]
     random_rows = db_fetchall(
-        f"""
+        """
         SELECT id FROM mcqs
-        WHERE subject_id IN ({placeholders})
+        WHERE subject_id IN (SELECT value FROM json_each(?))
         ORDER BY RANDOM()
         LIMIT ?
         """,
-        tuple(subject_ids) + (count,),
+        (subject_ids_json, count),
     )
     return [row["id"] for row in random_rows]
 
@@ -645,11 +891,12 @@ def take_exam(exam_id):
         FROM exam_questions
         JOIN mcqs ON mcqs.id = exam_questions.mcq_id
         WHERE exam_questions.exam_id = ?
+        ORDER BY exam_questions.id
         """,
         (exam_id,),
     )
     for question in questions:
-        question["options"] = json.loads(question["options_json"])
+        question["options"] = json_loads(question["options_json"])
     remaining_seconds = int((deadline - datetime.utcnow()).total_seconds())
     return render_template(
         "exam.html",
@@ -660,6 +907,7 @@ def take_exam(exam_id):
 
 
 def submit_exam(exam_id, user_id, form_data):
+    now_iso = datetime.utcnow().isoformat()
     questions = db_fetchall(
         """
         SELECT exam_questions.id AS exam_question_id, mcqs.id AS mcq_id, mcqs.correct_index
@@ -669,37 +917,46 @@ def submit_exam(exam_id, user_id, form_data):
         """,
         (exam_id,),
     )
+    statements = []
     for question in questions:
         selected = form_data.get(f"question_{question['exam_question_id']}")
         if selected is None:
             continue
         selected_index = int(selected)
         is_correct = 1 if selected_index == question["correct_index"] else 0
-        db_execute(
-            """
-            UPDATE exam_questions
-            SET selected_index = ?, is_correct = ?
-            WHERE id = ?
-            """,
-            (selected_index, is_correct, question["exam_question_id"]),
+        statements.append(
+            (
+                """
+                UPDATE exam_questions
+                SET selected_index = ?, is_correct = ?
+                WHERE id = ?
+                """,
+                (selected_index, is_correct, question["exam_question_id"]),
+            )
         )
-        db_execute(
-            """
-            INSERT INTO attempts (user_id, mcq_id, selected_index, is_correct, attempted_at)
-            VALUES (?, ?, ?, ?, ?)
-            """,
+        statements.append(
             (
-                user_id,
-                question["mcq_id"],
-                selected_index,
-                is_correct,
-                datetime.utcnow().isoformat(),
-            ),
+                """
+                INSERT INTO attempts (user_id, mcq_id, selected_index, is_correct, attempted_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (
+                    user_id,
+                    question["mcq_id"],
+                    selected_index,
+                    is_correct,
+                    now_iso,
+                ),
+            )
+        )
+    statements.append(
+        (
+            "UPDATE exams SET submitted_at = ? WHERE id = ?",
+            (now_iso, exam_id),
         )
-    db_execute(
-        "UPDATE exams SET submitted_at = ? WHERE id = ?",
-        (datetime.utcnow().isoformat(), exam_id),
     )
+    db_batch(statements)
+    invalidate_trend_history(user_id)
 
 
 @app.route("/exam/<int:exam_id>/result")
@@ -733,9 +990,41 @@ def exam_result(exam_id):
     return render_template("result.html", exam=exam, summary=summary, score=score)
 
 
-init_db()
-ensure_admin_seed()
+_db_ready = False
+_db_ready_lock = threading.Lock()
+
+
+def ensure_db_ready():
+    # Runs once per worker process, on its first request rather than at import.
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_ready_lock:
+        if not _db_ready:
+            init_db()
+            ensure_admin_seed()
+            _db_ready = True
+
+
+@app.before_request
+def prepare_db():
+    if AUTO_INIT_DB:
+        ensure_db_ready()
+
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create tables and indexes, and seed the admin account."""
+    init_db()
+    ensure_admin_seed()
+    click.echo("Initialized the database.")
+
+
+# ASGI entry point for uvicorn; sync views run on a2wsgi's thread pool.
+asgi_app = WSGIMiddleware(app)
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    import uvicorn
+
+    uvicorn.run(asgi_app, host="0.0.0.0", port=5000)